@@ -11,16 +11,19 @@ import re
 import json
 import pandas as pd
 import logging
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from glob import glob
 from filelock import FileLock
+from checkpoint import (atomic_write, file_signature, fsync_files, journal_path, load_journal,
+                        mark_done, mark_started, pending_files, remove_stale_temp_files,
+                        truncate_partial_line, unfinished_files)
 
 def load_config(config_path):
     with open(config_path, 'r') as file:
         config = json.load(file)
     return config
 
-def process_file(file_path, id_dir):
+def process_file(file_path, id_dir, purge):
     try:
         file_name = os.path.basename(file_path)
         file_prefix = file_name.split('_')[0]
@@ -35,19 +38,36 @@ def process_file(file_path, id_dir):
         # Group by the ID (assuming the ID is in the first column)
         grouped = df.groupby(df.columns[2])  # Adjusting to group by the third column which is the original ID column
         
+        # From here on the ID files may be modified: record it so an interrupted run can be undone
+        mark_started(journal_path(id_dir), file_path)
+
         # Write each group to the corresponding ID file
+        touched = []
         for id_value, group in grouped:
             id_file_path = os.path.join(id_dir, f"{id_value}.csv")
             lock_file_path = f"{id_file_path}.lock"
             with FileLock(lock_file_path):
-                if os.path.exists(id_file_path):
-                    group.to_csv(id_file_path, sep=';', mode='a', header=False, index=False)
+                if purge and os.path.exists(id_file_path):
+                    # A previous run may have written rows from this file already: rebuild
+                    # the ID file without them so they are not duplicated
+                    with open(id_file_path, 'r') as f:
+                        kept = [line for line in f
+                                if line.endswith('\n') and line.split(';', 1)[0] != file_name]
+                    with atomic_write(id_file_path) as tmp_path:
+                        with open(tmp_path, 'w', newline='') as f:
+                            f.writelines(kept)
+                            group.to_csv(f, sep=';', header=False, index=False)
                 else:
-                    group.to_csv(id_file_path, sep=';', mode='w', header=False, index=False)
+                    with open(id_file_path, 'a', newline='') as f:
+                        group.to_csv(f, sep=';', header=False, index=False)
+                    touched.append(id_file_path)
+
+        # Flush the appended rows to disk once, outside the locks, before the file is journaled
+        fsync_files(touched)
                 
-        return f"Processed {file_name}"
+        return True, f"Processed {file_name}"
     except Exception as e:
-        return f"Failed to process {file_name}: {e}"
+        return False, f"Failed to process {file_name}: {e}"
 
 def setup_logging(simel2id_log):
     logging.basicConfig(
@@ -76,6 +96,8 @@ def main():
     setup_logging(simel2id_log)
 
     os.makedirs(id_dir, exist_ok=True)
+    remove_stale_temp_files(id_dir)
+    journal_file = journal_path(id_dir)
     
     print(f"Buscando archivos en {simel_files_pattern}...")
     all_files = glob(simel_files_pattern)
@@ -90,18 +112,36 @@ def main():
     if not simel_files:
         print("No hay archivos que coincidan con el patrón. Saliendo...")
         return
+
+    # Reanudar desde el journal: saltar los archivos ya completados
+    done, started = load_journal(journal_file)
+    pending = pending_files(simel_files, done)
+
+    print(f"{len(simel_files) - len(pending)} archivos ya procesados, {len(pending)} pendientes.")
+
+    # Si una ejecución anterior se interrumpió, eliminar las líneas a medio escribir que pudo dejar
+    if unfinished_files(done, started):
+        print("Ejecución anterior interrumpida. Reparando archivos de usuario...")
+        for id_file_path in glob(os.path.join(id_dir, '*.csv')):
+            truncate_partial_line(id_file_path)
     
     print("Procesando archivos con ProcessPoolExecutor...")
     
     num_workers = max(1, os.cpu_count() - 1)  # Evita que el número de workers sea 0
     
-    with ProcessPoolExecutor(max_workers=num_workers) as executor:
-        results = list(executor.map(process_file, simel_files, [id_dir]*len(simel_files)))
+    # Tomar la firma de cada archivo antes de procesarlo
+    signatures = {file: file_signature(file) for file in pending}
 
-    print("Procesamiento finalizado. Guardando logs...")
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = {executor.submit(process_file, file, id_dir, os.path.basename(file) in started): file
+                   for file in pending}
+        for future in as_completed(futures):
+            ok, result = future.result()
+            if ok:
+                mark_done(journal_file, futures[future], signatures[futures[future]])
+            logging.info(result)
 
-    for result in results:
-        logging.info(result)
+    print("Procesamiento finalizado.")
     
     print("Script terminado correctamente.")
 
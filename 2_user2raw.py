@@ -10,9 +10,11 @@ import os
 import json
 import pandas as pd
 import logging
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from glob import glob
 from datetime import datetime, timedelta
+from checkpoint import (atomic_write, file_signature, journal_path, load_journal, mark_done,
+                        pending_files, remove_stale_temp_files, unfinished_files)
 
 def load_config(config_path):
     with open(config_path, 'r') as file:
@@ -110,14 +112,15 @@ def process_file(file_path, raw_dir):
 
         # Write the processed data to the corresponding raw file
         raw_file_path = os.path.join(raw_dir, file_name)
-        with open(raw_file_path, 'w') as f:
-            for row in padded_output_data:
-                f.write(';'.join(map(str, row)) + '\n')
+        with atomic_write(raw_file_path) as tmp_path:
+            with open(tmp_path, 'w') as f:
+                for row in padded_output_data:
+                    f.write(';'.join(map(str, row)) + '\n')
 
-        return f"Processed {file_name}"
+        return True, f"Processed {file_name}"
     except Exception as e:
         print(f"Error processing file {file_name}: {e}")
-        return f"Failed to process {file_name}: {e}"
+        return False, f"Failed to process {file_name}: {e}"
 
 def setup_logging(id2raw_log):
     logging.basicConfig(
@@ -139,21 +142,39 @@ def main():
     # Set up logging
     setup_logging(id2raw_log)
 
+    # User files may hold partial rows while stage 1 has unfinished SIMEL files
+    unfinished = unfinished_files(*load_journal(journal_path(config['id_dir'])))
+    if unfinished:
+        message = (f"Stage 1 has {len(unfinished)} unfinished SIMEL files "
+                   f"(e.g. {sorted(unfinished)[0]}). Rerun 1_simel2user.py before this stage.")
+        logging.error(message)
+        print(message)
+        return
+
     # Create the output directory if it doesn't exist
     os.makedirs(raw_dir, exist_ok=True)
+    remove_stale_temp_files(raw_dir)
+    journal_file = journal_path(raw_dir)
 
     id_files = glob(id_files_pattern)
 
+    # Skip files already completed by a previous run whose input has not changed since
+    done, _ = load_journal(journal_file)
+    id_files = pending_files(id_files, done)
+
+    # Take each input's signature before it is processed
+    signatures = {file: file_signature(file) for file in id_files}
+
     num_workers = max(1, os.cpu_count() - 1)  # Asegura al menos 1 worker
     # Process files in parallel using ProcessPoolExecutor
     with ProcessPoolExecutor(max_workers=num_workers) as executor:
-      futures = [executor.submit(process_file, file, raw_dir) for file in id_files]
-      results = [future.result() for future in futures]  # Obtiene resultados una vez completados
-
-
-    for result in results:
-        logging.info(result)
-        print(result)  # Print result to standard output for immediate feedback
+      futures = {executor.submit(process_file, file, raw_dir): file for file in id_files}
+      for future in as_completed(futures):
+          ok, result = future.result()
+          if ok:
+              mark_done(journal_file, futures[future], signatures[futures[future]])
+          logging.info(result)
+          print(result)  # Print result to standard output for immediate feedback
 
 if __name__ == "__main__":
     main()
@@ -12,6 +12,8 @@ import pandas as pd
 import logging
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from glob import glob
+from checkpoint import (atomic_write, file_signature, journal_path, load_journal, mark_done,
+                        pending_files, remove_stale_temp_files)
 
 def load_config(config_path):
     with open(config_path, 'r') as file:
@@ -145,7 +147,8 @@ def process_file(file_path, output_dir):
 
         output_df = pd.DataFrame(processed_data, columns=['dt', 'fl', 'kWh'])
         output_file_path = os.path.join(output_dir, file_name)
-        output_df.to_csv(output_file_path, index=False, sep=',')
+        with atomic_write(output_file_path) as tmp_path:
+            output_df.to_csv(tmp_path, index=False, sep=',')
 
         logging.info(f"Successfully processed file: {file_name}")
         return (file_name, max_entries, total_rows, unique_count, p5d_wins, p5d_mean,
@@ -184,6 +187,8 @@ def main():
     # Configurar logging y asegurarse que exista el directorio de salida
     setup_logging(log_file_path)
     os.makedirs(output_dir, exist_ok=True)
+    remove_stale_temp_files(output_dir)
+    journal_file = journal_path(output_dir)
 
     # Obtener lista de archivos y abortar si está vacía
     input_files = glob(input_pattern)
@@ -191,6 +196,14 @@ def main():
         logging.warning("No se encontraron archivos para procesar.")
         return
 
+    # Reanudar desde el journal: saltar los archivos ya completados y sin cambios
+    done, _ = load_journal(journal_file)
+    input_files = pending_files(input_files, done)
+    logging.info(f"{len(input_files)} archivos pendientes de procesar.")
+
+    # Tomar la firma de cada archivo antes de procesarlo
+    signatures = {file: file_signature(file) for file in input_files}
+
     num_workers = max(1, os.cpu_count() - 1)
 
     # Abrir el log especial en modo append y escribir la cabecera si el archivo está vacío
@@ -211,8 +224,16 @@ def main():
                         spec_log.write("{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{}\n".format(*result))
                         spec_log.flush()
                         os.fsync(spec_log.fileno())
+                        mark_done(journal_file, futures[future], signatures[futures[future]])
                 except Exception as e:
                     logging.error("Error al procesar {}: {}".format(futures[future], e))
 
+    # Un archivo reprocesado (tras una interrupción o por cambios en la entrada) vuelve a escribir
+    # su fila: conservar sólo la más reciente de cada archivo
+    stats_df = pd.read_csv(special_log_file)
+    stats_df = stats_df.drop_duplicates(subset='fname', keep='last')
+    with atomic_write(special_log_file) as tmp_path:
+        stats_df.to_csv(tmp_path, index=False)
+
 if __name__ == "__main__":
     main()
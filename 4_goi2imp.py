@@ -10,9 +10,11 @@ import os
 import pandas as pd
 from datetime import datetime, timedelta
 import pytz
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import json
 from multiprocessing import cpu_count, Manager
+from checkpoint import (atomic_write, file_signature, journal_path, load_journal, mark_done,
+                        pending_files, remove_stale_temp_files)
 
 # Cargar configuración desde config.json
 with open('config.json', 'r') as file:
@@ -108,7 +110,8 @@ def impute_values(file_path, output_folder, stats_list):
 
         # Guardar el archivo corregido
         output_file = os.path.join(output_folder, os.path.basename(file_path))
-        df.reset_index().to_csv(output_file, index=False)
+        with atomic_write(output_file) as tmp_path:
+            df.reset_index().to_csv(tmp_path, index=False)
 
         # Guardar en el CSV inmediatamente después de cada archivo procesado
         stats_df = pd.DataFrame([{
@@ -121,6 +124,8 @@ def impute_values(file_path, output_folder, stats_list):
 
         stats_df.to_csv(log_csv, mode='a', header=not os.path.exists(log_csv), index=False)
 
+        return file_path
+
     except Exception as e:
         # Registrar el error en la terminal para depuración
         print(f"Error procesando {file_path}: {e}")
@@ -138,6 +143,8 @@ def impute_values(file_path, output_folder, stats_list):
     
         stats_df.to_csv(log_csv, mode='a', header=not os.path.exists(log_csv), index=False)
 
+        return None
+
 # Función para procesar múltiples archivos en paralelo
 def process_files(config_path):
     with open(config_path, 'r') as file:
@@ -148,15 +155,36 @@ def process_files(config_path):
     stats_log_path = config['imputed_log']
     
     os.makedirs(output_folder, exist_ok=True)
+    remove_stale_temp_files(output_folder)
+    journal_file = journal_path(output_folder)
 
     files = [os.path.join(input_folder, f) for f in os.listdir(input_folder) if f.endswith('.csv')]
 
+    # Reanudar desde el journal: saltar los archivos ya imputados y sin cambios
+    done, _ = load_journal(journal_file)
+    files = pending_files(files, done)
+
+    # Tomar la firma de cada archivo antes de procesarlo
+    signatures = {file: file_signature(file) for file in files}
+
     with Manager() as manager:
         stats_list = manager.list()
 
         num_workers = max(1, cpu_count() - 1)  # Usa todos los núcleos menos uno
         with ProcessPoolExecutor(max_workers=num_workers) as executor:
-            executor.map(impute_values, files, [output_folder]*len(files), [stats_list]*len(files))
+            futures = {executor.submit(impute_values, file, output_folder, stats_list): file for file in files}
+            # Registrar en el journal cada archivo imputado correctamente en cuanto termina
+            for future in as_completed(futures):
+                if future.result() is not None:
+                    mark_done(journal_file, futures[future], signatures[futures[future]])
+
+        # Un archivo reprocesado (tras una interrupción o por cambios en la entrada) vuelve a escribir
+        # su fila: conservar sólo la más reciente de cada archivo
+        if os.path.exists(log_csv):
+            log_df = pd.read_csv(log_csv)
+            log_df = log_df.drop_duplicates(subset='fname', keep='last')
+            with atomic_write(log_csv) as tmp_path:
+                log_df.to_csv(tmp_path, index=False)
 
         # Guardar estadísticas en un CSV
         stats_df = pd.DataFrame(list(stats_list))
@@ -0,0 +1,120 @@
+# -----------------------------------------------------------------------------------
+# Script Name: checkpoint.py
+# Author: Carlos Quesada Granja
+# Affiliation: Universidad de Deusto
+# Website: www.quesadagranja.com
+# Year: 2025
+# -----------------------------------------------------------------------------------
+
+import os
+from contextlib import contextmanager
+from filelock import FileLock
+
+JOURNAL_NAME = '.journal'
+
+def journal_path(output_dir):
+    return os.path.join(output_dir, JOURNAL_NAME)
+
+def file_signature(file_path):
+    # An input is considered unchanged while its size and mtime stay the same
+    stat = os.stat(file_path)
+    return (str(stat.st_size), str(stat.st_mtime_ns))
+
+def load_journal(journal_file):
+    done = {}
+    started = set()
+    if not os.path.exists(journal_file):
+        return done, started
+
+    with open(journal_file, 'r') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                continue  # Torn record from an interrupted run
+            parts = line.rstrip('\n').split('\t')
+            if parts[0] == 'start' and len(parts) == 2:
+                started.add(parts[1])
+                done.pop(parts[1], None)
+            elif parts[0] == 'done' and len(parts) == 4:
+                done[parts[1]] = tuple(parts[2:])
+    return done, started
+
+def pending_files(file_paths, done):
+    return [f for f in file_paths if done.get(os.path.basename(f)) != file_signature(f)]
+
+def unfinished_files(done, started):
+    # Files a previous run started but never recorded as done
+    return started - set(done)
+
+def truncate_partial_line(file_path):
+    # Drop a trailing line left half-written by a killed process
+    with open(file_path, 'rb+') as f:
+        pos = f.seek(0, os.SEEK_END)
+        if pos == 0:
+            return
+        f.seek(pos - 1)
+        if f.read(1) == b'\n':
+            return
+
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            idx = chunk.rfind(b'\n')
+            if idx != -1:
+                f.truncate(pos - step + idx + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+def _append_record(journal_file, fields):
+    with FileLock(f"{journal_file}.lock"):
+        if os.path.exists(journal_file):
+            truncate_partial_line(journal_file)
+        with open(journal_file, 'a') as f:
+            f.write('\t'.join(fields) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+def mark_started(journal_file, file_path):
+    _append_record(journal_file, ['start', os.path.basename(file_path)])
+
+def mark_done(journal_file, file_path, signature):
+    # signature must be taken before the file is read, so a file that changes while it is being
+    # processed is not recorded with its new signature and stays pending
+    _append_record(journal_file, ['done', os.path.basename(file_path), *signature])
+
+def fsync_files(file_paths):
+    for file_path in file_paths:
+        with open(file_path, 'rb+') as f:
+            os.fsync(f.fileno())
+
+def fsync_dir(dir_path):
+    if os.name == 'nt':
+        return  # Directories cannot be opened for fsync on Windows
+    fd = os.open(dir_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+@contextmanager
+def atomic_write(file_path):
+    # Yield a hidden temporary path next to file_path and move it into place only
+    # once the block has finished, so readers never see a half-written file
+    dir_name, base_name = os.path.split(file_path)
+    tmp_path = os.path.join(dir_name, f".{base_name}.tmp")
+    try:
+        yield tmp_path
+        with open(tmp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+        fsync_dir(dir_name or '.')
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def remove_stale_temp_files(output_dir):
+    for name in os.listdir(output_dir):
+        if name.startswith('.') and name.endswith('.tmp'):
+            os.remove(os.path.join(output_dir, name))